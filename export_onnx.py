@@ -11,7 +11,7 @@ from tqdm import tqdm
 from module.spectrogram import spectrogram
 from module.pitch_estimator import PitchEstimator, PitchEstimatorOnnxWraper
 from module.content_encoder import ContentEncoder
-from module.decoder import Decoder, DecoderOnnxWrapper
+from module.decoder import Decoder
 from module.common import match_features, compute_f0, compute_amplitude
 from module.voice_library import VoiceLibrary
 
@@ -33,7 +33,9 @@ Dec = Decoder().to(device)
 PE.load_state_dict(torch.load(args.pitch_estimator_path, map_location=device))
 CE.load_state_dict(torch.load(args.content_encoder_path, map_location=device))
 Dec.load_state_dict(torch.load(args.decoder_path, map_location=device))
-Dec = DecoderOnnxWrapper(Dec)
+PE.fuse_for_inference()
+CE.fuse_for_inference()
+Dec.fuse_for_inference()
 
 if not os.path.exists(args.outputs):
     os.mkdir(args.outputs)
@@ -74,21 +76,7 @@ torch.onnx.export(
             })
 
 print("Exporting Decoder...")
-dummy_input = torch.randn(1, 768, 256)
-dummy_f0 = torch.randn(1, 1, 256)
-dummy_amp = torch.randn(1, 1, 256)
-torch.onnx.export(
-        Dec,
-        (dummy_input, dummy_f0, dummy_amp),
-        os.path.join(args.outputs, "decoder.onnx"),
-        opset_version=15,
-        input_names=["input", "f0", "amplitude"],
-        output_names=["magnitude", "phase"],
-        dynamic_axes={
-            "input": {0: "barch_size", 2: "length"},
-            "f0" : {0: "batch_size", 2: "length"},
-            "amplitude": {0: "batch_size", 2: "length"},
-            })
+Dec.export_onnx(os.path.join(args.outputs, "decoder.onnx"))
 
 if VL is not None:
     print("Exporting Voice Library")
@@ -38,6 +38,7 @@ parser.add_argument('--feature-matching', default=2, type=float)
 parser.add_argument('--mel', default=45, type=float)
 parser.add_argument('--content', default=1, type=float)
 parser.add_argument('-wpe', '--world-pitch-estimation', default=False, type=bool)
+parser.add_argument('-f0m', '--f0-method', default='world', choices=['world', 'torch'])
 parser.add_argument('--max-step', default=-1, type=int)
 parser.add_argument('-lib', '--voice-library-path', default="NONE")
 parser.add_argument('-fd', '--freeze-discriminator', default=False)
@@ -140,7 +141,7 @@ for epoch in range(args.epoch):
         with torch.cuda.amp.autocast(enabled=args.fp16):
             with torch.no_grad():
                 if args.world_pitch_estimation:
-                    f0 = compute_f0(wave)
+                    f0 = compute_f0(wave, method=args.f0_method)
                 else:
                     f0 = pe.estimate(spec)
                 content = ce(spec)
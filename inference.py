@@ -11,7 +11,7 @@ from tqdm import tqdm
 from module.spectrogram import spectrogram
 from module.pitch_estimator import PitchEstimator
 from module.content_encoder import ContentEncoder
-from module.decoder import Decoder
+from module.decoder import Decoder, DecoderOnnxRuntime
 from module.common import match_features, compute_f0, compute_amplitude
 from module.voice_library import VoiceLibrary
 
@@ -19,6 +19,7 @@ parser = argparse.ArgumentParser()
 parser.add_argument('-i', '--inputs', default="./inputs/")
 parser.add_argument('-o', '--outputs', default="./outputs/")
 parser.add_argument('-dep', '--decoder-path', default="decoder.pt")
+parser.add_argument('-deop', '--decoder-onnx-path', default="NONE")
 parser.add_argument('-disp', '--discriminator-path', default="discriminator.pt")
 parser.add_argument('-cep', '--content-encoder-path', default="content_encoder.pt")
 parser.add_argument('-pep', '--pitch-estimator-path', default="pitch_estimator.pt")
@@ -35,18 +36,29 @@ parser.add_argument('-lib', '--voice-library-path', default="NONE")
 parser.add_argument('-noise', '--noise-gain', default=1.0, type=float)
 parser.add_argument('--breath', default=False, type=bool)
 parser.add_argument('-wpe', '--world-pitch-estimation', default=False)
+parser.add_argument('-f0m', '--f0-method', default='world', choices=['world', 'torch'])
 parser.add_argument('-norm', '--normalize', default=False, type=bool)
+parser.add_argument('-bf16', default=False, type=bool)
 
 args = parser.parse_args()
 
 device = torch.device(args.device)
+# audio is converted in fixed-size chunks, so let cuDNN autotune its conv algorithms once
+torch.backends.cudnn.benchmark = True
 
 PE = PitchEstimator().to(device)
 CE = ContentEncoder().to(device)
-Dec = Decoder().to(device)
 PE.load_state_dict(torch.load(args.pitch_estimator_path, map_location=device))
 CE.load_state_dict(torch.load(args.content_encoder_path, map_location=device))
-Dec.load_state_dict(torch.load(args.decoder_path, map_location=device))
+PE.fuse_for_inference()
+CE.fuse_for_inference()
+if args.decoder_onnx_path != "NONE":
+    # decoder.onnx from export_onnx.py, run by onnxruntime (TensorRT / CUDA / CPU)
+    Dec = DecoderOnnxRuntime(args.decoder_onnx_path)
+else:
+    Dec = Decoder().to(device)
+    Dec.load_state_dict(torch.load(args.decoder_path, map_location=device))
+    Dec.fuse_for_inference()
 
 if not os.path.exists(args.outputs):
     os.mkdir(args.outputs)
@@ -87,7 +99,7 @@ for i, path in enumerate(paths):
     chunks = chunks.transpose(1, 2).split(1, dim=1)
 
     result = []
-    with torch.no_grad():
+    with torch.inference_mode():
         print(f"converting {path}")
         for chunk in tqdm(chunks):
             chunk = chunk.squeeze(1)
@@ -97,7 +109,7 @@ for i, path in enumerate(paths):
             chunk = chunk.to(device)
             spec = spectrogram(chunk)
             if args.world_pitch_estimation:
-                f0 = compute_f0(chunk)
+                f0 = compute_f0(chunk, method=args.f0_method)
             else:
                 f0 = PE.estimate(spec)
             if args.breath:
@@ -118,7 +130,8 @@ for i, path in enumerate(paths):
 
             feat = CE(spec)
             feat = match_features(feat, tgt, k=args.k, alpha=args.alpha)
-            chunk = Dec(feat, f0  * args.f0_rate, amp)
+            with torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=args.bf16):
+                chunk = Dec(feat, f0  * args.f0_rate, amp)
             
             chunk = chunk[:, args.chunk:-args.chunk]
 
@@ -4,6 +4,8 @@ import torch.nn.functional as F
 import torchaudio
 import pyworld as pw
 import numpy as np
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 
 class ChannelNorm(nn.Module):
@@ -12,13 +14,19 @@ class ChannelNorm(nn.Module):
         self.scale = nn.Parameter(torch.ones(1, channels, 1))
         self.shift = nn.Parameter(torch.zeros(1, channels, 1))
         self.eps = eps
+        self.affine = True # False once scale/shift are folded into the next conv
 
     def forward(self, x):
-        mu = x.mean(dim=1, keepdim=True)
-        sigma = x.std(dim=1, keepdim=True) + self.eps
-        x = (x - mu) / sigma
-        x = x * self.scale + self.shift
-        return x
+        dtype = x.dtype
+        # statistics stay in fp32 under autocast
+        with torch.autocast(device_type=x.device.type, enabled=False):
+            x = x.float()
+            # single pass over x; unbiased to stay compatible with trained checkpoints
+            var, mu = torch.var_mean(x, dim=1, keepdim=True, unbiased=True)
+            x = (x - mu) * torch.rsqrt(var + self.eps ** 2)
+            if self.affine:
+                x = torch.addcmul(self.shift, x, self.scale)
+        return x.to(dtype)
 
 
 class AdaptiveChannelNorm(nn.Module):
@@ -29,11 +37,14 @@ class AdaptiveChannelNorm(nn.Module):
         self.eps = eps
 
     def forward(self, x, p):
-        mu = x.mean(dim=1, keepdim=True)
-        sigma = x.std(dim=1, keepdim=True) + self.eps
-        x = (x - mu) / sigma
-        x = x * self.scale(p) + self.shift(p)
-        return x
+        dtype = x.dtype
+        with torch.autocast(device_type=x.device.type, enabled=False):
+            x = x.float()
+            p = p.float()
+            var, mu = torch.var_mean(x, dim=1, keepdim=True, unbiased=True)
+            x = (x - mu) * torch.rsqrt(var + self.eps ** 2)
+            x = torch.addcmul(self.shift(p), x, self.scale(p))
+        return x.to(dtype)
 
 
 
@@ -45,6 +56,7 @@ class ConvNeXt1d(nn.Module):
         self.pw_conv1 = nn.Conv1d(channels, hidden_channels, 1)
         self.pw_conv2 = nn.Conv1d(hidden_channels, channels, 1)
         self.scale = nn.Parameter(torch.ones(1, channels, 1) * scale)
+        self.fused = False
 
     def forward(self, x):
         res = x
@@ -53,9 +65,16 @@ class ConvNeXt1d(nn.Module):
         x = self.pw_conv1(x)
         x = F.gelu(x)
         x = self.pw_conv2(x)
-        x = x * self.scale
+        if not self.fused:
+            x = x * self.scale
         return x + res
 
+    # fold the norm's affine part into pw_conv1 and the layer scale into pw_conv2
+    def fuse_for_inference(self):
+        fold_channel_norm(self.norm, self.pw_conv1)
+        fold_layer_scale(self)
+        return self
+
 
 class AdaptiveConvNeXt1d(nn.Module):
     def __init__(self, channels=512, hidden_channels=1536, condition_emb=512, kernel_size=7, scale=1):
@@ -65,6 +84,7 @@ class AdaptiveConvNeXt1d(nn.Module):
         self.pw_conv1 = nn.Conv1d(channels, hidden_channels, 1)
         self.pw_conv2 = nn.Conv1d(hidden_channels, channels, 1)
         self.scale = nn.Parameter(torch.ones(1, channels, 1) * scale)
+        self.fused = False
 
     def forward(self, x, p):
         res = x
@@ -73,14 +93,52 @@ class AdaptiveConvNeXt1d(nn.Module):
         x = self.pw_conv1(x)
         x = F.gelu(x)
         x = self.pw_conv2(x)
-        x = x * self.scale
+        if not self.fused:
+            x = x * self.scale
         return x + res
 
+    # the norm's scale/shift depend on the condition, only the layer scale can be folded
+    def fuse_for_inference(self):
+        fold_layer_scale(self)
+        return self
+
+
+# Inference-time folding of affine ops into the following 1x1 conv.
+# The folded parameters are reset to identity, so a saved state_dict stays valid for unfused models.
+def fold_channel_norm(norm, conv):
+    with torch.no_grad():
+        conv.bias.add_(conv.weight[:, :, 0] @ norm.shift.view(-1))
+        conv.weight.mul_(norm.scale.view(1, -1, 1))
+        norm.scale.fill_(1.0)
+        norm.shift.zero_()
+    norm.affine = False
+
+
+def fold_layer_scale(block):
+    with torch.no_grad():
+        block.pw_conv2.weight.mul_(block.scale.view(-1, 1, 1))
+        block.pw_conv2.bias.mul_(block.scale.view(-1))
+        block.scale.fill_(1.0)
+    block.fused = True
+
 
 # helper functions
+# Compile module.forward with static shapes (CUDA graphs on GPU) for repeated inference.
+# Every new input shape triggers a recompilation, so keep lengths fixed or bucket them.
+def compile_for_inference(module, sample_inputs=None):
+    module.eval()
+    module.forward = torch.compile(module.forward, mode="reduce-overhead", dynamic=False, fullgraph=True)
+    if sample_inputs is not None:
+        with torch.inference_mode():
+            for _ in range(3): # reduce-overhead records the graph after warmup runs
+                module(*sample_inputs)
+    return module
+
+
 def match_features(source, reference, k=4, alpha=0.0):
     input_data = source
-    with torch.no_grad():
+    # matched features carry no gradient, only the alpha bypass does
+    with torch.inference_mode():
         # source: [N, 768, Length], reference: [N, 768, Length]
         source = source.transpose(1, 2)
         reference = reference.transpose(1, 2)
@@ -89,34 +147,102 @@ def match_features(source, reference, k=4, alpha=0.0):
         cos_sims = torch.bmm((source / source_norm), (reference / reference_norm).transpose(1, 2))
         best = torch.topk(cos_sims, k, dim=2)
 
-    result = torch.stack([reference[n][best.indices[n]] for n in range(source.shape[0])], dim=0).mean(dim=2)
-    result = result.transpose(1, 2)
+        # gather the k nearest reference frames for every source frame in one kernel
+        N, L, _ = best.indices.shape
+        indices = best.indices.reshape(N, L * k, 1).expand(-1, -1, reference.shape[2])
+        result = torch.gather(reference, 1, indices).view(N, L, k, -1).mean(dim=2)
+        result = result.transpose(1, 2)
     return result * (1-alpha) + input_data * alpha
 
 
 
-def compute_f0(wf, sample_rate=16000, segment_size=256, f0_min=20, f0_max=4096):
+_f0_executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+_f0_scratch = np.empty(0, dtype=np.double)
+
+
+# pyworld needs float64 input; reuse one buffer instead of allocating a new array per call
+def _f0_scratch_buffer(shape):
+    global _f0_scratch
+    size = shape[0] * shape[1]
+    if _f0_scratch.size < size:
+        _f0_scratch = np.empty(size, dtype=np.double)
+    return _f0_scratch[:size].reshape(shape)
+
+
+def _world_f0(signal, sample_rate, f0_min, f0_max):
+    _f0, t = pw.dio(signal, sample_rate, f0_floor=f0_min, f0_ceil=f0_max)
+    return pw.stonemask(signal, _f0, t, sample_rate)
+
+
+# method: 'world' (pyworld dio + stonemask on CPU) or 'torch' (compute_f0_torch on wf.device)
+def compute_f0(wf, sample_rate=16000, segment_size=256, f0_min=20, f0_max=4096, method='world'):
+    if method == 'torch':
+        return compute_f0_torch(wf, sample_rate, segment_size, f0_min, f0_max)
     if wf.ndim == 1:
+        return compute_f0(wf.unsqueeze(0), sample_rate, segment_size, f0_min, f0_max)[0]
+    elif wf.ndim == 2:
         device = wf.device
-        signal = wf.detach().cpu().numpy()
-        signal = signal.astype(np.double)
-        _f0, t = pw.dio(signal, sample_rate, f0_floor=f0_min, f0_ceil=f0_max)
-        f0 = pw.stonemask(signal, _f0, t, sample_rate)
-        f0 = torch.from_numpy(f0).to(torch.float)
+        signals = _f0_scratch_buffer(wf.shape)
+        signals[...] = wf.detach().cpu().numpy()
+        # pyworld releases the GIL, so the batch is analyzed in parallel threads
+        f0 = _f0_executor.map(lambda signal: _world_f0(signal, sample_rate, f0_min, f0_max), signals)
+        f0 = torch.from_numpy(np.stack(list(f0), axis=0)).to(torch.float)
         f0 = f0.to(device)
-        f0 = f0.unsqueeze(0).unsqueeze(0)
-        f0 = F.interpolate(f0, wf.shape[0] // segment_size, mode='linear')
-        f0 = f0.squeeze(0)
+        f0 = f0.unsqueeze(1)
+        f0 = F.interpolate(f0, wf.shape[1] // segment_size, mode='linear')
         return f0
-    elif wf.ndim == 2:
-        waves = wf.split(1, dim=0)
-        pitchs = [compute_f0(wave[0], sample_rate, segment_size) for wave in waves]
-        pitchs = torch.stack(pitchs, dim=0)
-        return pitchs
+
+
+# autocorrelation pitch tracker, runs batched on wf.device (no pyworld / CPU round-trip)
+def compute_f0_torch(wf, sample_rate=16000, segment_size=256, f0_min=20, f0_max=4096, threshold=0.3):
+    if wf.ndim == 1:
+        return compute_f0_torch(wf.unsqueeze(0), sample_rate, segment_size, f0_min, f0_max, threshold)[0]
+    lag_min = max(int(sample_rate / f0_max), 1)
+    lag_max = int(sample_rate / f0_min)
+    win_length = 2 ** int(np.ceil(np.log2(lag_max * 2)))
+    win_length = min(win_length, 2 ** int(np.log2(max(wf.shape[1], 8)))) # short inputs get a shorter window
+    n_fft = win_length * 2 # zero padding keeps the circular autocorrelation alias-free up to win_length
+    window = torch.hann_window(win_length, device=wf.device)
+
+    # Wiener-Khinchin: autocorrelation = irfft(|stft|^2)
+    # constant padding: reflect padding would reject inputs shorter than n_fft // 2
+    def autocorrelation(x):
+        spec = torch.stft(x, n_fft, segment_size, win_length, window=window,
+                          pad_mode='constant', return_complex=True)
+        return torch.fft.irfft(spec.real ** 2 + spec.imag ** 2, n=n_fft, dim=1)[:, :win_length]
+
+    acf = autocorrelation(wf.to(torch.float))
+    # autocorrelation of the window's support in each frame (partly zero at the edges) for unbiasing
+    support = autocorrelation(torch.ones(1, wf.shape[1], device=wf.device))
+    valid = support > support[:, :1] * 0.05
+    acf = acf / (acf[:, :1] + 1e-8) * (support[:, :1] / support.clamp_min(1e-8))
+    acf = acf * valid
+
+    lag_max = min(lag_max, win_length - 2)
+    r = acf[:, lag_min:lag_max+1]
+    prev = acf[:, lag_min-1:lag_max]
+    post = acf[:, lag_min+1:lag_max+2]
+    # every multiple of the period peaks equally, so take the shortest lag close to the best peak
+    is_peak = (r > prev) & (r >= post) & (r >= r.max(dim=1, keepdim=True).values * 0.8)
+    lag = is_peak.to(torch.uint8).argmax(dim=1, keepdim=True)
+    peak = r.gather(1, lag).squeeze(1)
+    lag = lag.squeeze(1) + lag_min
+
+    # parabolic interpolation around the peak for sub-sample lag resolution
+    left = acf.gather(1, (lag - 1).unsqueeze(1)).squeeze(1)
+    right = acf.gather(1, (lag + 1).unsqueeze(1)).squeeze(1)
+    denom = left - 2 * peak + right
+    offset = torch.where(denom.abs() > 1e-8, 0.5 * (left - right) / denom, torch.zeros_like(denom))
+    f0 = sample_rate / (lag + offset.clamp(-0.5, 0.5))
+    f0 = f0 * ((peak > threshold) & is_peak.any(dim=1)) # unvoiced frames are 0, like pyworld
+
+    f0 = F.interpolate(f0.unsqueeze(1), wf.shape[1] // segment_size, mode='linear')
+    return f0
 
 
 def compute_amplitude(x, segment_size=256):
-    x = x.abs()
-    x = x.unsqueeze(1)
-    x = F.avg_pool1d(x, segment_size, segment_size)
+    # non-overlapping window mean: drop the tail like avg_pool1d, then reduce each window
+    B, T = x.shape
+    x = x[:, :T - T % segment_size].abs()
+    x = x.reshape(B, 1, T // segment_size, segment_size).mean(dim=3)
     return x
@@ -2,7 +2,7 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
-from module.common import ConvNeXt1d, ChannelNorm
+from module.common import ConvNeXt1d, ChannelNorm, compile_for_inference, fold_channel_norm
 
 
 class ContentEncoder(nn.Module):
@@ -25,3 +25,15 @@ class ContentEncoder(nn.Module):
         x = self.last_norm(x)
         x = self.output_layer(x)
         return x
+
+    def compile_for_inference(self, sample_shape=None):
+        sample_inputs = None
+        if sample_shape is not None:
+            sample_inputs = (torch.zeros(*sample_shape, device=self.output_layer.weight.device),)
+        return compile_for_inference(self, sample_inputs)
+
+    def fuse_for_inference(self):
+        for layer in self.mid_layers:
+            layer.fuse_for_inference()
+        fold_channel_norm(self.last_norm, self.output_layer)
+        return self
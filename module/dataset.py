@@ -42,7 +42,7 @@ class WaveFileDirectory(torch.utils.data.Dataset):
 
 
 class WaveFileDirectoryWithF0(torch.utils.data.Dataset):
-    def __init__(self, source_dir_paths=[], length=65536, max_files=-1, sampling_rate=16000):
+    def __init__(self, source_dir_paths=[], length=65536, max_files=-1, sampling_rate=16000, f0_method='world'):
         super().__init__()
         print("Loading Data")
         self.path_list = []
@@ -64,10 +64,13 @@ class WaveFileDirectoryWithF0(torch.utils.data.Dataset):
             # Chunk
             waves = torch.split(wf, length, dim=1)
             tqdm.write(f"    Loading {len(waves)} data...")
-            for w in waves:
-                if w.shape[1] == length:
-                    self.data.append(w[0])
-                    self.f0.append(compute_f0(w)[0])
+            waves = [w[0] for w in waves if w.shape[1] == length]
+            if len(waves) == 0:
+                continue
+            # label all chunks of a file in one batched call
+            f0 = compute_f0(torch.stack(waves, dim=0), sampling_rate, method=f0_method)
+            self.data += waves
+            self.f0 += list(f0)
         self.length = length
         print(f"Loaded total {len(self.data)} data.")
 
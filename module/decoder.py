@@ -1,8 +1,15 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from torch.nn.utils import weight_norm, remove_weight_norm
-from module.common import AdaptiveConvNeXt1d, AdaptiveChannelNorm
+from module.common import AdaptiveConvNeXt1d, AdaptiveChannelNorm, compile_for_inference
+
+def synthesize(mag, phase, n_fft=1024, hop_length=256):
+    mag = mag.to(torch.float)
+    phase = phase.to(torch.float)
+    mag = torch.exp(torch.clamp_max(mag, 6.0))
+    s = torch.polar(mag, phase) # mag * (cos(phase) + j sin(phase)) in one kernel
+    return torch.istft(s, n_fft, hop_length=hop_length)
+
 
 class F0Encoder(nn.Module):
     def __init__(self, output_dim=512):
@@ -12,8 +19,10 @@ class F0Encoder(nn.Module):
         self.c1.weight.data.normal_(0, 0.3)
 
     def forward(self, x):
-        x = self.c1(x)
-        x = torch.sin(x)
+        # sin(c1(f0)) has arguments of tens of radians, too large for half precision
+        with torch.autocast(device_type=x.device.type, enabled=False):
+            x = self.c1(x.float())
+            x = torch.sin(x)
         x = self.c2(x)
         return x
 
@@ -48,9 +57,16 @@ class Decoder(nn.Module):
         self.output_layer = nn.Conv1d(channels, n_fft+2, 1)
         self.n_fft = n_fft
         self.hop_length = hop_length
+        self.fused = False
+
+    def condition(self, f0, amp):
+        if self.fused:
+            # amp_enc's bias lives in f0_enc.c2, its rank-1 weight is applied with one addcmul
+            return torch.addcmul(self.f0_enc(f0), self.amp_enc.c1.weight.view(1, -1, 1), amp)
+        return self.f0_enc(f0) + self.amp_enc(amp)
 
     def mag_phase(self, x, f0, amp):
-        condition = self.f0_enc(f0) + self.amp_enc(amp)
+        condition = self.condition(f0, amp)
         condition = self.pad(condition)
         x = self.pad(x)
         x = self.input_layer(x)
@@ -61,15 +77,48 @@ class Decoder(nn.Module):
         return x.chunk(2, dim=1)
 
     def forward(self, x, f0, amp):
-        dtype = x.dtype
         mag, phase = self.mag_phase(x, f0, amp)
-        mag = mag.to(torch.float)
-        phase = phase.to(torch.float)
-        mag = torch.clamp_max(mag, 6.0)
-        mag = torch.exp(mag)
-        phase = torch.cos(phase) + 1j * torch.sin(phase)
-        s = mag * phase
-        return torch.istft(s, self.n_fft, hop_length=self.hop_length)
+        return synthesize(mag, phase, self.n_fft, self.hop_length)
+
+    def compile_for_inference(self, sample_shape=None):
+        sample_inputs = None
+        if sample_shape is not None:
+            device = self.output_layer.weight.device
+            sample_inputs = (torch.zeros(*sample_shape, device=device),
+                             torch.zeros(sample_shape[0], 1, sample_shape[2], device=device),
+                             torch.zeros(sample_shape[0], 1, sample_shape[2], device=device))
+        return compile_for_inference(self, sample_inputs)
+
+    def fuse_for_inference(self):
+        for layer in self.mid_layers:
+            layer.fuse_for_inference()
+        # f0_enc and amp_enc outputs are summed, so one bias is enough
+        with torch.no_grad():
+            self.f0_enc.c2.bias.add_(self.amp_enc.c1.bias)
+            self.amp_enc.c1.bias.zero_()
+        self.fused = True
+        return self
+
+    # Export the convolutional part (mag_phase) to ONNX; the iSTFT runs in torch afterwards,
+    # see DecoderOnnxRuntime.
+    def export_onnx(self, path, sample_shape=(1, 768, 256), opset_version=15):
+        self.eval()
+        device = self.output_layer.weight.device
+        x = torch.randn(*sample_shape, device=device)
+        f0 = torch.randn(sample_shape[0], 1, sample_shape[2], device=device)
+        amp = torch.randn(sample_shape[0], 1, sample_shape[2], device=device)
+        torch.onnx.export(
+                DecoderOnnxWrapper(self),
+                (x, f0, amp),
+                path,
+                opset_version=opset_version,
+                input_names=["input", "f0", "amplitude"],
+                output_names=["magnitude", "phase"],
+                dynamic_axes={
+                    "input": {0: "batch_size", 2: "length"},
+                    "f0" : {0: "batch_size", 2: "length"},
+                    "amplitude": {0: "batch_size", 2: "length"},
+                    })
 
 
 class DecoderOnnxWrapper(nn.Module):
@@ -80,3 +129,22 @@ class DecoderOnnxWrapper(nn.Module):
     def forward(self, x, f0, amp):
         mag, phase = self.decoder.mag_phase(x, f0, amp)
         return mag, phase
+
+
+class DecoderOnnxRuntime:
+    def __init__(self, path, n_fft=1024, hop_length=256,
+                 providers=('TensorrtExecutionProvider', 'CUDAExecutionProvider', 'CPUExecutionProvider')):
+        import onnxruntime as ort
+        available = ort.get_available_providers()
+        self.session = ort.InferenceSession(path, providers=[p for p in providers if p in available])
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+
+    def __call__(self, x, f0, amp):
+        mag, phase = self.session.run(["magnitude", "phase"], {
+            "input": x.detach().cpu().float().numpy(),
+            "f0": f0.detach().cpu().float().numpy(),
+            "amplitude": amp.detach().cpu().float().numpy()})
+        mag = torch.from_numpy(mag).to(x.device)
+        phase = torch.from_numpy(phase).to(x.device)
+        return synthesize(mag, phase, self.n_fft, self.hop_length)
@@ -2,7 +2,7 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import torchaudio
-from torch.nn.utils import weight_norm
+from torch.nn.utils.parametrizations import weight_norm
 
 
 LRELU_SLOPE = 0.1
@@ -187,7 +187,4 @@ class Discriminator(nn.Module):
         with torch.no_grad():
             real_feat = self.MPD.feat(real) + self.MRD.feat(real)
         fake_feat = self.MPD.feat(fake) + self.MRD.feat(fake)
-        loss = 0
-        for r, f in zip(real_feat, fake_feat):
-            loss = loss + F.l1_loss(f, r)
-        return loss
+        return torch.stack([F.l1_loss(f, r) for r, f in zip(real_feat, fake_feat)]).sum()
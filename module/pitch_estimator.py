@@ -2,7 +2,7 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
-from module.common import ConvNeXt1d, ChannelNorm
+from module.common import ConvNeXt1d, ChannelNorm, compile_for_inference, fold_channel_norm
 
 
 class PitchEstimator(nn.Module):
@@ -26,6 +26,18 @@ class PitchEstimator(nn.Module):
         x = self.output_layer(x)
         return x
 
+    def compile_for_inference(self, sample_shape=None):
+        sample_inputs = None
+        if sample_shape is not None:
+            sample_inputs = (torch.zeros(*sample_shape, device=self.output_layer.weight.device),)
+        return compile_for_inference(self, sample_inputs)
+
+    def fuse_for_inference(self):
+        for layer in self.mid_layers:
+            layer.fuse_for_inference()
+        fold_channel_norm(self.last_norm, self.output_layer)
+        return self
+
     def estimate(self, x, downsample_factor=1):
         dtype = x.dtype
         with torch.no_grad():
@@ -28,7 +28,10 @@ class VoiceLibrary(nn.Module):
         cos_sims = torch.bmm((source / source_norm), (reference / reference_norm).transpose(1, 2))
         best = torch.topk(cos_sims, k, dim=2)
 
-        result = torch.stack([reference[n][best.indices[n]] for n in range(source.shape[0])], dim=0).mean(dim=2)
+        # gather the k nearest tokens for every source frame in one kernel
+        N, L, _ = best.indices.shape
+        indices = best.indices.reshape(N, L * k, 1).expand(-1, -1, reference.shape[2])
+        result = torch.gather(reference, 1, indices).view(N, L, k, -1).mean(dim=2)
         result = result.transpose(1, 2)
         return result * (1-alpha) + input_data * alpha
 
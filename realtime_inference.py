@@ -43,10 +43,12 @@ parser.add_argument('-a', '--alpha', default=0.0, type=float)
 parser.add_argument('-fp16', default=False, type=bool)
 parser.add_argument('-lib', '--voice-library-path', default="NONE")
 parser.add_argument('-wpe', '--world-pitch-estimation', default=False, type=bool)
+parser.add_argument('-f0m', '--f0-method', default='world', choices=['world', 'torch'])
 parser.add_argument('-isr', '--input-sr', default=16000, type=int)
 parser.add_argument('-osr', '--output-sr', default=16000, type=int)
 parser.add_argument('-lsr', '--loopback-sr', default=16000, type=int)
 parser.add_argument('-ll', '--low-latency-mode', default=False, type=bool)
+parser.add_argument('-compile', default=False, type=bool)
 
 
 
@@ -65,6 +67,8 @@ if device_name == 'mps':
         exit()
 
 device = torch.device(device_name)
+# every frame has the same shape, so let cuDNN autotune its conv algorithms once
+torch.backends.cudnn.benchmark = True
 input_buff = []
 chunk = args.chunk
 buffer_size = args.buffersize
@@ -76,6 +80,9 @@ Dec = Decoder().to(device)
 PE.load_state_dict(torch.load(args.pitch_estimator_path, map_location=device))
 CE.load_state_dict(torch.load(args.content_encoder_path, map_location=device))
 Dec.load_state_dict(torch.load(args.decoder_path, map_location=device))
+PE.fuse_for_inference()
+CE.fuse_for_inference()
+Dec.fuse_for_inference()
 
 tgt = torch.zeros(1, 768, 0).to(device)
 
@@ -96,6 +103,13 @@ if args.voice_library_path != "NONE":
 
 print(f"Loaded {tgt.shape[2]} words.")
 
+if args.compile:
+    # compiled after the one-off target pass above: only the fixed-size input buffers
+    # reach the compiled models, so they compile once on the first chunk
+    PE.compile_for_inference()
+    CE.compile_for_inference()
+    Dec.compile_for_inference()
+
 
 
 stream_input = audio.open(
@@ -147,7 +161,7 @@ while True:
             # convert voice
             content = CE(spec)
             if args.world_pitch_estimation:
-                f0 = compute_f0(data)
+                f0 = compute_f0(data, method=args.f0_method)
             else:
                 f0 = PE.estimate(spec) * args.f0_rate
 
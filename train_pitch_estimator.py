@@ -26,6 +26,7 @@ parser.add_argument('-len', '--length', default=65536, type=int)
 parser.add_argument('-m', '--max-data', default=-1, type=int)
 parser.add_argument('-fp16', default=False, type=bool)
 parser.add_argument('-gacc', '--gradient-accumulation', default=1, type=int)
+parser.add_argument('-f0m', '--f0-method', default='world', choices=['world', 'torch'])
 
 args = parser.parse_args()
 
@@ -47,7 +48,8 @@ model = load_or_init_models(device)
 ds = WaveFileDirectoryWithF0(
         [args.dataset],
         length=args.length,
-        max_files=args.max_data
+        max_files=args.max_data,
+        f0_method=args.f0_method
         )
 
 dl = torch.utils.data.DataLoader(ds, batch_size=args.batch_size, shuffle=True)